@@ -1,86 +1,91 @@
 from __future__ import annotations
 
-import re
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, List, Optional, Tuple
 
+import pyarrow as pa
+import requests
 import streamlit as st
 
 from src import executor, generator, linker, schema_store
 from src.config import load_config
+from src.pipeline import link_and_retrieve
+from src.results import compact_entities, compact_schema, parse_results
 
-IMAGE_URL_RE = re.compile(r"https?://\S+\.(?:png|jpg)(?:[?#]\S+)?$", re.IGNORECASE)
 CHAT_IMAGE_WIDTH = 320
 
 
-def _looks_like_image_url(value: str) -> bool:
-    return bool(IMAGE_URL_RE.match(value.strip()))
-
-
-def _stringify_binding(binding: Dict[str, Any]) -> str:
-    value = binding.get("value", "")
-    lang = binding.get("xml:lang") or binding.get("lang")
-    datatype = binding.get("datatype")
-    if lang:
-        return f"{value} (@{lang})"
-    if datatype:
-        short_type = datatype.rsplit("#", 1)[-1]
-        return f"{value} ({short_type})"
-    return str(value)
-
-
-def _compact_entities(entities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    return [
-        {
-            "surface": ent.get("surface_form", ""),
-            "uri": ent.get("uri", ""),
-            "types": ent.get("types", ""),
-        }
-        for ent in entities
-    ]
-
-
-def _compact_schema(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    return [
-        {
-            "label": item.get("label", ""),
-            "prefixed": item.get("prefixed", ""),
-            "uri": item.get("uri", ""),
-        }
-        for item in items
-    ]
-
-
-def _parse_results(results: Dict[str, Any]) -> Tuple[List[Dict[str, str]], List[str], List[str]]:
-    if "boolean" in results:
-        value = "true" if results.get("boolean") else "false"
-        return [{"ASK": value}], ["ASK"], []
-
-    head = results.get("head", {})
-    vars_ = head.get("vars", [])
-    bindings = results.get("results", {}).get("bindings", [])
-    rows: List[Dict[str, str]] = []
-    image_urls: List[str] = []
-
-    for row in bindings:
-        row_data: Dict[str, str] = {}
-        for var in vars_:
-            binding = row.get(var, {})
-            value = binding.get("value", "")
-            if isinstance(value, str) and _looks_like_image_url(value):
-                image_urls.append(value)
-            row_data[var] = _stringify_binding(binding)
-        rows.append(row_data)
-
-    image_urls = sorted(set(image_urls))
-    return rows, vars_, image_urls
+def _to_arrow_table(data: Dict[str, List[str]], columns: List[str]) -> pa.Table:
+    # Streamlit renders Arrow tables natively, skipping the pandas round trip.
+    return pa.table({var: pa.array(data[var], type=pa.string()) for var in columns})
 
 
-@st.cache_resource(show_spinner=False)
 def _init_pipeline() -> Tuple[Any, Any, Any]:
     config = load_config()
-    store = schema_store.SchemaStore(config)
-    gen = generator.SparqlGenerator(config)
-    return config, store, gen
+    return config, schema_store.get_schema_store(config), generator.get_generator(config)
+
+
+class _UncachedResult(Exception):
+    """Carries a degraded result out of a cached function so it is not stored."""
+
+    def __init__(self, value: Any) -> None:
+        super().__init__()
+        self.value = value
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _cached_link_entities(question: str, _config: Any) -> List[Dict[str, Any]]:
+    # Raise on Spotlight errors: st.cache_data does not store exceptions.
+    return linker.link_entities(question, _config, fail_softly=False)
+
+
+def _link_entities(question: str, config: Any) -> List[Dict[str, Any]]:
+    try:
+        return _cached_link_entities(question, config)
+    except requests.RequestException:
+        # Same soft fallback as link_entities, kept outside the cache.
+        return []
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _cached_retrieve_classes(question: str, _store: Any) -> List[Dict[str, str]]:
+    return _store.retrieve_classes(question)
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _cached_retrieve(
+    question: str, entity_uris: Tuple[str, ...], _store: Any
+) -> List[Dict[str, str]]:
+    # Property retrieval only reads entity URIs, so they are the cache key.
+    properties = _store.retrieve(question, entities=[{"uri": uri} for uri in entity_uris])
+    if not _store.has_entity_properties(list(entity_uris)):
+        # An entity fetch failed and the result fell back to static properties.
+        raise _UncachedResult(properties)
+    return properties
+
+
+class _CachedSchemaStore:
+    """SchemaStore facade whose lookups go through the st.cache_data wrappers."""
+
+    def __init__(self, store: Any) -> None:
+        self._store = store
+
+    def retrieve_classes(self, question: str) -> List[Dict[str, str]]:
+        return _cached_retrieve_classes(question, self._store)
+
+    def retrieve(
+        self, question: str, entities: Optional[List[Dict[str, Any]]] = None
+    ) -> List[Dict[str, str]]:
+        entity_uris = tuple(sorted({ent["uri"] for ent in entities or [] if ent.get("uri")}))
+        try:
+            return _cached_retrieve(question, entity_uris, self._store)
+        except _UncachedResult as degraded:
+            return degraded.value
+
+
+@st.cache_resource(show_spinner=False)
+def _get_thread_pool() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=3)
 
 
 def _render_message(message: Dict[str, Any]) -> None:
@@ -100,9 +105,9 @@ def _render_message(message: Dict[str, Any]) -> None:
 
         results = message.get("results")
         if results is not None:
-            rows = results.get("rows", [])
-            if rows:
-                st.dataframe(rows, use_container_width=True)
+            table = results.get("table")
+            if table is not None and table.num_rows:
+                st.dataframe(table, use_container_width=True)
             else:
                 st.info("No results.")
 
@@ -119,30 +124,32 @@ def _process_question(
     query = ""
 
     with st.status("Processing...", expanded=False) as status:
-        st.write("🔍 Identifying Entities...")
-        entities = linker.link_entities(question, config)
+        status.update(label="🔍 Identifying Entities and 📚 Retrieving Schema...")
+        entities, classes, properties = link_and_retrieve(
+            question,
+            config,
+            _CachedSchemaStore(store),
+            _get_thread_pool(),
+            link=_link_entities,
+        )
         if not entities:
             errors.append("No entities found. Try adding a specific name or place.")
 
-        st.write("📚 Retrieving Schema...")
-        classes = store.retrieve_classes(question)
-        properties = store.retrieve(question, entities=entities)
-
-        st.write("Entities found")
         if entities:
-            st.table(_compact_entities(entities))
+            st.write("Entities found")
+            st.table(compact_entities(entities))
         else:
-            st.write("None")
+            st.write("Entities found: None")
 
         st.write("Schema used: Classes")
-        st.table(_compact_schema(classes))
+        st.table(compact_schema(classes))
         st.write("Schema used: Properties")
-        st.table(_compact_schema(properties))
+        st.table(compact_schema(properties))
 
-        st.write("💡 Generating SPARQL...")
+        status.update(label="💡 Generating SPARQL...")
         query = gen.generate(question, entities, properties, classes)
 
-        st.write("⚡ Executing query...")
+        status.update(label="⚡ Executing query...")
         try:
             results = executor.execute_query(query, config)
             status.update(label="Done", state="complete")
@@ -168,8 +175,8 @@ def _process_question(
         message["content"] = "I couldn't retrieve any results."
         return message
 
-    rows, columns, image_urls = _parse_results(results)
-    message["results"] = {"rows": rows, "columns": columns}
+    data, columns, image_urls = parse_results(results)
+    message["results"] = {"table": _to_arrow_table(data, columns), "columns": columns}
     if image_urls:
         message["image_urls"] = image_urls
     return message
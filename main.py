@@ -2,21 +2,23 @@ from __future__ import annotations
 
 import argparse
 import os
-from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, Optional
 
-from rich import box
 from rich.console import Console
 from rich.panel import Panel
 from rich.status import Status
-from rich.syntax import Syntax
-from rich.table import Table
 from rich.text import Text
 
 from src.config import Config, load_config
 from src.executor import execute_query
-from src.generator import SparqlGenerator
-from src.linker import link_entities
-from src.schema_store import SchemaStore
+from src.generator import SparqlGenerator, get_generator
+from src.pipeline import link_and_retrieve
+from src.results import stringify_binding
+from src.schema_store import SchemaStore, get_schema_store
+
+if TYPE_CHECKING:
+    from rich.table import Table
 
 BANNER = r"""
  _   _ _     ____  ____   ____  ____   ___   ____  _     
@@ -26,26 +28,21 @@ BANNER = r"""
 |_| \_|_____|____/|_|    \____||_| \_\\___/ \____||_____|
 """
 
+_BANNER_PANEL = Panel.fit(
+    Text(BANNER.strip("\n"), style="bold cyan"), border_style="blue", title="NL2SPARQL"
+)
 
-def render_banner(console: Console) -> None:
-    logo = Text(BANNER.strip("\n"), style="bold cyan")
-    panel = Panel.fit(logo, border_style="blue", title="NL2SPARQL")
-    console.print(panel)
+_POOL = ThreadPoolExecutor(max_workers=3)
 
 
-def _stringify_binding(binding: Dict[str, Any]) -> str:
-    value = binding.get("value", "")
-    lang = binding.get("xml:lang") or binding.get("lang")
-    datatype = binding.get("datatype")
-    if lang:
-        return f"{value} (@{lang})"
-    if datatype:
-        short_type = datatype.rsplit("#", 1)[-1]
-        return f"{value} ({short_type})"
-    return str(value)
+def render_banner(console: Console) -> None:
+    console.print(_BANNER_PANEL)
 
 
 def build_results_table(results: Dict[str, Any]) -> Table:
+    from rich import box
+    from rich.table import Table
+
     if "boolean" in results:
         table = Table(title="Results", box=box.SIMPLE_HEAVY)
         table.add_column("ASK")
@@ -69,7 +66,7 @@ def build_results_table(results: Dict[str, Any]) -> Table:
         return table
 
     for row in bindings:
-        table.add_row(*[_stringify_binding(row.get(var, {})) for var in vars_])
+        table.add_row(*[stringify_binding(row.get(var, {})) for var in vars_])
     return table
 
 
@@ -80,24 +77,24 @@ def run_pipeline(
     schema_store: SchemaStore,
     generator: SparqlGenerator,
 ) -> None:
+    from rich.syntax import Syntax
+
     execution_error: Optional[str] = None
     results: Optional[Dict[str, Any]] = None
 
     with console.status("[bold green]Thinking...", spinner="dots") as status:
         status: Status
-        status.update("Step 1/4: Scanning user question for entities...")
-        entities = link_entities(question, config)
+        status.update("Step 1/3: Scanning entities and mapping schema constraints...")
+        entities, classes, properties = link_and_retrieve(
+            question, config, schema_store, _POOL
+        )
 
         status.update(
-            f"Step 2/4: Mapping schema constraints (found {len(entities)} entities)..."
+            f"Step 2/3: Drafting SPARQL query (found {len(entities)} entities)..."
         )
-        classes = schema_store.retrieve_classes(question)
-        properties = schema_store.retrieve(question, entities=entities)
-
-        status.update("Step 3/4: Drafting SPARQL query...")
         query = generator.generate(question, entities, properties, classes)
 
-        status.update("Step 4/4: Executing query...")
+        status.update("Step 3/3: Executing query...")
         try:
             results = execute_query(query, config)
         except Exception as exc:
@@ -136,8 +133,8 @@ def main() -> None:
         console.print(f"[bold red]Configuration error:[/] {exc}")
         raise SystemExit(1)
 
-    schema_store = SchemaStore(config)
-    generator = SparqlGenerator(config)
+    schema_store = get_schema_store(config)
+    generator = get_generator(config)
 
     banner_enabled = not os.getenv("NL2SPARQL_NO_BANNER")
     if args.question:
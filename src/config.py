@@ -3,7 +3,8 @@ from __future__ import annotations
 
 import os
 from dataclasses import dataclass
-from typing import Optional
+from functools import lru_cache
+from typing import Optional, Tuple
 
 from dotenv import load_dotenv
 
@@ -15,6 +16,7 @@ class Config:
     groq_api_key: str
     groq_model: str
     embedding_model: str
+    embedding_backend: str
     spotlight_endpoint: str
     spotlight_confidence: float
     spotlight_support: int
@@ -27,13 +29,28 @@ class Config:
     default_select_limit: int
 
 
+def load_embedding_settings() -> Tuple[str, str]:
+    """Return ``(embedding_model, embedding_backend)`` from the environment.
+
+    Unlike load_config this needs no API key, so offline embedding jobs can
+    use it.
+    """
+    load_dotenv()
+    return (
+        os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2"),
+        os.getenv("EMBEDDING_BACKEND", "torch"),
+    )
+
+
+@lru_cache(maxsize=1)
 def load_config() -> Config:
     """Load environment variables and build a Config object.
 
     The dotenv file is optional; in production, env vars can be injected
-    by the shell or container runtime.
+    by the shell or container runtime. The result is cached per process;
+    a failed load raises and is retried on the next call.
     """
-    load_dotenv()
+    embedding_model, embedding_backend = load_embedding_settings()
 
     groq_api_key = os.getenv("GROQ_API_KEY", "").strip()
     if not groq_api_key:
@@ -42,7 +59,8 @@ def load_config() -> Config:
     return Config(
         groq_api_key=groq_api_key,
         groq_model=os.getenv("GROQ_MODEL", "openai/gpt-oss-120b"),
-        embedding_model=os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2"),
+        embedding_model=embedding_model,
+        embedding_backend=embedding_backend,
         spotlight_endpoint=os.getenv(
             "SPOTLIGHT_ENDPOINT", "https://api.dbpedia-spotlight.org/en/annotate"
         ),
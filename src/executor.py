@@ -1,20 +1,75 @@
 """SPARQL query execution against the DBpedia endpoint."""
 from __future__ import annotations
 
-from typing import Any, Dict
+import asyncio
+from typing import TYPE_CHECKING, Any, Dict, List, Sequence
 
-from SPARQLWrapper import JSON, SPARQLWrapper
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
 
 from src.config import Config
 
+if TYPE_CHECKING:
+    import aiohttp
+
+SPARQL_RESULTS_JSON = "application/sparql-results+json"
+
+# One keep-alive connection pool per process, shared by all sessions/threads.
+_SESSION = requests.Session()
+_SESSION.mount("http://", HTTPAdapter(pool_maxsize=16))
+_SESSION.mount("https://", HTTPAdapter(pool_maxsize=16))
+_SESSION.headers.update(
+    {
+        "Accept": SPARQL_RESULTS_JSON,
+        "Accept-Encoding": "gzip, deflate",
+        "Connection": "keep-alive",
+    }
+)
+
 
 def execute_query(query: str, config: Config) -> Dict[str, Any]:
     """Execute a SPARQL query and return the parsed JSON results."""
-    sparql = SPARQLWrapper(config.dbpedia_sparql_endpoint)
-    sparql.setQuery(query)
-    sparql.setReturnFormat(JSON)
-    sparql.setTimeout(config.request_timeout_sec)
     try:
-        return sparql.query().convert()
+        response = _SESSION.post(
+            config.dbpedia_sparql_endpoint,
+            data={"query": query},
+            timeout=config.request_timeout_sec,
+        )
+        response.raise_for_status()
+        return orjson.loads(response.content)
+    except Exception as exc:
+        raise RuntimeError(f"SPARQL query failed: {exc}") from exc
+
+
+async def _aexecute(
+    query: str, session: aiohttp.ClientSession, endpoint: str
+) -> Dict[str, Any]:
+    async with session.post(endpoint, data={"query": query}) as response:
+        response.raise_for_status()
+        return orjson.loads(await response.read())
+
+
+async def _aexecute_all(queries: Sequence[str], config: Config) -> List[Dict[str, Any]]:
+    import aiohttp
+
+    timeout = aiohttp.ClientTimeout(total=config.request_timeout_sec)
+    # Same request shape as execute_query: form-encoded query, shared headers.
+    async with aiohttp.ClientSession(headers=dict(_SESSION.headers), timeout=timeout) as session:
+        return await asyncio.gather(
+            *(_aexecute(query, session, config.dbpedia_sparql_endpoint) for query in queries)
+        )
+
+
+def execute_queries(queries: Sequence[str], config: Config) -> List[Dict[str, Any]]:
+    """Execute several SPARQL queries concurrently, preserving input order.
+
+    All requests share one HTTP session; the first failure aborts the batch.
+    Must not be called from a running event loop.
+    """
+    if not queries:
+        return []
+    try:
+        return asyncio.run(_aexecute_all(queries, config))
     except Exception as exc:
         raise RuntimeError(f"SPARQL query failed: {exc}") from exc
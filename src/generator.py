@@ -5,8 +5,13 @@ classes, which reduces hallucinations and keeps queries executable.
 """
 from __future__ import annotations
 
+import hashlib
 import re
-from typing import Dict, List, Set
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Set, Tuple
 
 from groq import Groq
 
@@ -25,8 +30,67 @@ PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
 
 FALLBACK_QUERY = f"{DEFAULT_PREFIXES}ASK {{ FILTER(false) }}\n"
 
-_PREFIXED_TOKEN_RE = re.compile(r"\b(?:dbo|dbp|dbr|rdf|rdfs|foaf|xsd):[A-Za-z_][\w-]*\b")
-_URI_RE = re.compile(r"<([^>]+)>")
+RESPONSE_CACHE_SIZE = 512
+BATCH_MAX_WORKERS = 4
+
+# (question, entities, properties, classes), as accepted by generate().
+GenerationRequest = Tuple[
+    str, List[Dict[str, str]], List[Dict[str, str]], List[Dict[str, str]]
+]
+
+_DEFAULT_PREFIX_LINES = tuple(DEFAULT_PREFIXES.strip().splitlines())
+_DEFAULT_PREFIX_NAMES = tuple(line.split()[1] for line in _DEFAULT_PREFIX_LINES)
+
+# Group 1 captures a bracketed IRI; otherwise the match is a prefixed name.
+_IDENTIFIER_RE = re.compile(
+    r"<([^>]+)>|\b(?:dbo|dbp|dbr|rdf|rdfs|foaf|xsd):[A-Za-z_][\w-]*\b"
+)
+_BUILTIN_ALLOWED = frozenset(
+    {
+        "rdf:type",
+        "rdfs:label",
+        "dbo:abstract",
+        "http://www.w3.org/1999/02/22-rdf-syntax-ns#type",
+        "http://www.w3.org/2000/01/rdf-schema#label",
+        "http://dbpedia.org/ontology/abstract",
+    }
+)
+_XSD_PREFIXES = ("xsd:", "http://www.w3.org/2001/XMLSchema#")
+
+_SELECT_RE = re.compile(r"\bSELECT\b", re.IGNORECASE)
+_LIMIT_RE = re.compile(r"\bLIMIT\b", re.IGNORECASE)
+_VERB_RE = re.compile(r"\b(SELECT|ASK|CONSTRUCT|DESCRIBE)\b", re.IGNORECASE)
+
+
+def _entity_line(ent: Dict[str, str]) -> str:
+    uri = ent.get("uri", "")
+    prefixed = uri_to_prefixed(uri) if uri else ""
+    types = ent.get("types", "")
+    type_hint = f" | types='{types}'" if types else ""
+    return f"- {prefixed} | {uri} | surface='{ent.get('surface_form', '')}'{type_hint}"
+
+
+def _schema_line(item: Dict[str, str]) -> str:
+    description = item.get("description", "")
+    desc_hint = f" | desc='{description}'" if description else ""
+    return f"- {item['prefixed']} | {item['uri']} | label='{item['label']}'{desc_hint}"
+
+
+# Byte-identical across calls so the provider can reuse its cached prefill;
+# the only configurable rule is appended after it.
+_SYSTEM_PROMPT_PREFIX = (
+    "You are a DBpedia SPARQL generator.\n"
+    "Use the following prefixes when relevant:\n"
+    f"{DEFAULT_PREFIXES}"
+    "Rules you must follow:\n"
+    "- Use ONLY properties listed under Allowed Properties.\n"
+    "- Use ONLY entities listed under Allowed Entities.\n"
+    "- Use ONLY classes listed under Allowed Classes.\n"
+    "- Use rdf:type only with Allowed Classes.\n"
+    "- Do NOT invent properties, entities, or classes.\n"
+    "- If the request cannot be answered with the allowed items, output a query that returns no results using FILTER(false).\n"
+    "- Output only valid SPARQL with PREFIX declarations. No markdown or explanations.\n"
+)
 
 
 class SparqlGenerator:
@@ -35,21 +99,30 @@ class SparqlGenerator:
     def __init__(self, config: Config) -> None:
         self.config = config
         self.client = Groq(api_key=config.groq_api_key)
+        self._response_cache: "OrderedDict[str, str]" = OrderedDict()
+        self._response_cache_lock = threading.Lock()
+
+    def _cache_key(self, system_prompt: str, user_prompt: str) -> str:
+        payload = "\0".join([system_prompt, user_prompt, self.config.groq_model])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _cached_response(self, key: str) -> Optional[str]:
+        with self._response_cache_lock:
+            query = self._response_cache.get(key)
+            if query is not None:
+                self._response_cache.move_to_end(key)
+            return query
+
+    def _store_response(self, key: str, query: str) -> None:
+        with self._response_cache_lock:
+            self._response_cache[key] = query
+            if len(self._response_cache) > RESPONSE_CACHE_SIZE:
+                self._response_cache.popitem(last=False)
 
     def _build_system_prompt(self) -> str:
         return (
-            "You are a DBpedia SPARQL generator.\n"
-            "Rules you must follow:\n"
-            "- Use ONLY properties listed under Allowed Properties.\n"
-            "- Use ONLY entities listed under Allowed Entities.\n"
-            "- Use ONLY classes listed under Allowed Classes.\n"
-            "- Use rdf:type only with Allowed Classes.\n"
-            "- Do NOT invent properties, entities, or classes.\n"
-            "- If the request cannot be answered with the allowed items, output a query that returns no results using FILTER(false).\n"
-            "- Output only valid SPARQL with PREFIX declarations. No markdown or explanations.\n"
+            f"{_SYSTEM_PROMPT_PREFIX}"
             f"- For SELECT queries, include LIMIT {self.config.default_select_limit} unless the user asks for all results.\n"
-            "- Use the following prefixes when relevant:\n"
-            f"{DEFAULT_PREFIXES}"
         )
 
     def _build_user_prompt(
@@ -59,45 +132,19 @@ class SparqlGenerator:
         properties: List[Dict[str, str]],
         classes: List[Dict[str, str]],
     ) -> str:
-        entity_lines = []
-        for ent in entities:
-            uri = ent.get("uri", "")
-            prefixed = uri_to_prefixed(uri) if uri else ""
-            surface = ent.get("surface_form", "")
-            types = ent.get("types", "")
-            type_hint = f" | types='{types}'" if types else ""
-            entity_lines.append(f"- {prefixed} | {uri} | surface='{surface}'{type_hint}")
-
-        property_lines = []
-        for prop in properties:
-            prefixed = prop.get("prefixed", uri_to_prefixed(prop.get("uri", "")))
-            label = prop.get("label", "")
-            uri = prop.get("uri", "")
-            description = prop.get("description", "")
-            desc_hint = f" | desc='{description}'" if description else ""
-            property_lines.append(f"- {prefixed} | {uri} | label='{label}'{desc_hint}")
-
-        class_lines = []
-        for cls in classes:
-            prefixed = cls.get("prefixed", uri_to_prefixed(cls.get("uri", "")))
-            label = cls.get("label", "")
-            uri = cls.get("uri", "")
-            description = cls.get("description", "")
-            desc_hint = f" | desc='{description}'" if description else ""
-            class_lines.append(f"- {prefixed} | {uri} | label='{label}'{desc_hint}")
-
-        entities_block = "\n".join(entity_lines) if entity_lines else "- (none)"
-        properties_block = "\n".join(property_lines) if property_lines else "- (none)"
-        classes_block = "\n".join(class_lines) if class_lines else "- (none)"
+        entities_block = "\n".join(map(_entity_line, entities)) or "- (none)"
+        properties_block = "\n".join(map(_schema_line, properties)) or "- (none)"
+        classes_block = "\n".join(map(_schema_line, classes)) or "- (none)"
 
+        # Least to most question-specific, so requests share the longest prefix.
         return (
-            f"Question: {question}\n\n"
-            "Allowed Entities:\n"
-            f"{entities_block}\n\n"
             "Allowed Classes:\n"
             f"{classes_block}\n\n"
             "Allowed Properties:\n"
-            f"{properties_block}\n"
+            f"{properties_block}\n\n"
+            "Allowed Entities:\n"
+            f"{entities_block}\n\n"
+            f"Question: {question}\n"
         )
 
     def _extract_query(self, text: str) -> str:
@@ -118,28 +165,27 @@ class SparqlGenerator:
                 parts = line.split()
                 if len(parts) >= 2:
                     existing.add(parts[1].strip())
-        missing = []
-        for prefix_line in DEFAULT_PREFIXES.strip().splitlines():
-            parts = prefix_line.split()
-            if len(parts) >= 2 and parts[1].strip() not in existing:
-                missing.append(prefix_line)
+        missing = [
+            prefix_line
+            for prefix_line, name in zip(_DEFAULT_PREFIX_LINES, _DEFAULT_PREFIX_NAMES)
+            if name not in existing
+        ]
         if missing:
             return "\n".join(missing + lines).strip() + "\n"
         return query.strip() + "\n"
 
     def _ensure_select_limit(self, query: str) -> str:
-        if re.search(r"\bSELECT\b", query, re.IGNORECASE) and not re.search(
-            r"\bLIMIT\b", query, re.IGNORECASE
-        ):
+        if _SELECT_RE.search(query) and not _LIMIT_RE.search(query):
             return f"{query.rstrip()}\nLIMIT {self.config.default_select_limit}\n"
         return query
 
     def _extract_identifiers(self, query: str) -> Set[str]:
-        body = "\n".join(
-            line for line in query.splitlines() if not line.lstrip().upper().startswith("PREFIX")
-        )
-        identifiers = set(_URI_RE.findall(body))
-        identifiers.update(_PREFIXED_TOKEN_RE.findall(body))
+        identifiers: Set[str] = set()
+        for line in query.splitlines():
+            if line.lstrip().upper().startswith("PREFIX"):
+                continue
+            for match in _IDENTIFIER_RE.finditer(line):
+                identifiers.add(match.group(1) or match.group(0))
         return identifiers
 
     def _allowed_identifiers(
@@ -158,22 +204,13 @@ class SparqlGenerator:
             uri = prop.get("uri", "")
             if uri:
                 allowed.add(uri)
-                allowed.add(prop.get("prefixed", uri_to_prefixed(uri)))
+                allowed.add(prop["prefixed"])
         for cls in classes:
             uri = cls.get("uri", "")
             if uri:
                 allowed.add(uri)
-                allowed.add(cls.get("prefixed", uri_to_prefixed(uri)))
-        allowed.update(
-            {
-                "rdf:type",
-                "rdfs:label",
-                "dbo:abstract",
-                "http://www.w3.org/1999/02/22-rdf-syntax-ns#type",
-                "http://www.w3.org/2000/01/rdf-schema#label",
-                "http://dbpedia.org/ontology/abstract",
-            }
-        )
+                allowed.add(cls["prefixed"])
+        allowed |= _BUILTIN_ALLOWED
         return allowed
 
     def _is_valid_query(
@@ -183,17 +220,11 @@ class SparqlGenerator:
         properties: List[Dict[str, str]],
         classes: List[Dict[str, str]],
     ) -> bool:
-        if not re.search(r"\b(SELECT|ASK|CONSTRUCT|DESCRIBE)\b", query, re.IGNORECASE):
+        if not _VERB_RE.search(query):
             return False
         identifiers = self._extract_identifiers(query)
-        allowed = self._allowed_identifiers(entities, properties, classes)
-        for ident in identifiers:
-            if ident in allowed:
-                continue
-            if ident.startswith("xsd:") or ident.startswith("http://www.w3.org/2001/XMLSchema#"):
-                continue
-            return False
-        return True
+        unknown = identifiers - self._allowed_identifiers(entities, properties, classes)
+        return all(ident.startswith(_XSD_PREFIXES) for ident in unknown)
 
     def generate(
         self,
@@ -205,13 +236,18 @@ class SparqlGenerator:
         """Generate a SPARQL query grounded in the retrieved entities and schema.
 
         If the context is empty, we return a safe query that yields no results
-        instead of letting the model improvise.
+        instead of letting the model improvise. Validated queries are cached by
+        prompt, so an identical question and context skips the LLM call.
         """
         if not entities and not properties and not classes:
             return FALLBACK_QUERY
 
         system_prompt = self._build_system_prompt()
         user_prompt = self._build_user_prompt(question, entities, properties, classes)
+        cache_key = self._cache_key(system_prompt, user_prompt)
+        cached = self._cached_response(cache_key)
+        if cached is not None:
+            return cached
 
         try:
             response = self.client.chat.completions.create(
@@ -227,9 +263,33 @@ class SparqlGenerator:
             return FALLBACK_QUERY
 
         content = response.choices[0].message.content or ""
+        if not content.strip():
+            return FALLBACK_QUERY
         query = self._extract_query(content)
         query = self._ensure_prefixes(query)
         query = self._ensure_select_limit(query)
         if not self._is_valid_query(query, entities, properties, classes):
             return FALLBACK_QUERY
-        return query.strip()
+        query = query.strip()
+        self._store_response(cache_key, query)
+        return query
+
+    def generate_batch(
+        self, requests: Sequence[GenerationRequest], max_workers: int = BATCH_MAX_WORKERS
+    ) -> List[str]:
+        """Generate queries for many questions concurrently, preserving order.
+
+        Intended for offline evaluation: Groq calls overlap instead of paying
+        one round trip after another. Each item goes through ``generate``, so
+        caching, validation and fallbacks behave exactly as for single calls.
+        """
+        if not requests:
+            return []
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(lambda request: self.generate(*request), requests))
+
+
+@lru_cache(maxsize=1)
+def get_generator(config: Config) -> SparqlGenerator:
+    """Return the process-wide SparqlGenerator for the given config."""
+    return SparqlGenerator(config)
@@ -5,71 +5,86 @@ against DBpedia, turning surface forms into canonical URIs.
 """
 from __future__ import annotations
 
+import heapq
 from typing import Dict, List
 
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
 
 from src.config import Config
 
+# Keep-alive pool so repeated questions reuse the TLS connection to Spotlight.
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=8))
+_SESSION.headers.update({"Accept": "application/json", "User-Agent": "nl2sparql/1.0"})
 
-def link_entities(question: str, config: Config) -> List[Dict[str, str]]:
+
+def link_entities(
+    question: str, config: Config, fail_softly: bool = True
+) -> List[Dict[str, str]]:
     """Link surface forms in the question to DBpedia entities.
 
     The output is a compact list of entity URIs that can be used as grounded
-    anchors for SPARQL generation.
+    anchors for SPARQL generation. Spotlight request errors yield ``[]``
+    unless ``fail_softly`` is False, in which case they propagate.
     """
     params = {
         "text": question,
         "confidence": str(config.spotlight_confidence),
         "support": str(config.spotlight_support),
     }
-    headers = {"Accept": "application/json", "User-Agent": "nl2sparql/1.0"}
 
     try:
-        response = requests.get(
+        response = _SESSION.get(
             config.spotlight_endpoint,
             params=params,
-            headers=headers,
             timeout=config.request_timeout_sec,
         )
         response.raise_for_status()
     except requests.RequestException:
+        if not fail_softly:
+            raise
         # Fail softly; the downstream stages can still attempt to answer.
         return []
 
-    data = response.json()
+    data = orjson.loads(response.content)
     resources = data.get("Resources", [])
     if not resources:
         return []
 
     entities: List[Dict[str, str]] = []
     seen = set()
+    min_similarity = config.spotlight_confidence
+    min_support = config.spotlight_support
     for res in resources:
-        uri = res.get("@URI")
+        get = res.get
+        uri = get("@URI")
         if not uri or uri in seen:
             continue
         seen.add(uri)
         try:
-            similarity = float(res.get("@similarityScore", "0") or 0)
+            similarity = float(get("@similarityScore") or 0)
         except (TypeError, ValueError):
             similarity = 0.0
         try:
-            support = int(res.get("@support", "0") or 0)
+            support = int(get("@support") or 0)
         except (TypeError, ValueError):
             support = 0
-        if similarity < config.spotlight_confidence or support < config.spotlight_support:
+        if similarity < min_similarity or support < min_support:
             continue
         entities.append(
             {
-                "surface_form": res.get("@surfaceForm", ""),
+                "surface_form": get("@surfaceForm", ""),
                 "uri": uri,
-                "types": res.get("@types", ""),
+                "types": get("@types", ""),
                 "similarity_score": similarity,
                 "support": support,
             }
         )
 
-    entities.sort(
-        key=lambda ent: (ent.get("similarity_score", 0), ent.get("support", 0)), reverse=True
+    return heapq.nlargest(
+        config.max_entities,
+        entities,
+        key=lambda ent: (ent["similarity_score"], ent["support"]),
     )
-    return entities[: config.max_entities]
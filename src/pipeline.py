@@ -0,0 +1,35 @@
+"""Shared orchestration of the entity linking and schema retrieval stages.
+
+Entity linking and class retrieval are independent, so they are dispatched
+concurrently; property retrieval waits only on the linked entities.
+"""
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+from src.config import Config
+from src.linker import link_entities
+from src.schema_store import SchemaStore
+
+
+def link_and_retrieve(
+    question: str,
+    config: Config,
+    store: SchemaStore,
+    pool: ThreadPoolExecutor,
+    link: Callable[[str, Config], List[Dict[str, str]]] = link_entities,
+) -> Tuple[List[Dict[str, str]], List[Dict[str, str]], List[Dict[str, str]]]:
+    """Return ``(entities, classes, properties)`` for the question.
+
+    ``store`` only needs ``retrieve`` and ``retrieve_classes``, so callers may
+    pass a caching facade; ``link`` likewise replaces ``link_entities``.
+    Exceptions raised by any stage propagate to the caller unchanged.
+    """
+    entities_future = pool.submit(link, question, config)
+    classes_future = pool.submit(store.retrieve_classes, question)
+
+    entities = entities_future.result()
+    properties_future = pool.submit(store.retrieve, question, entities=entities)
+
+    return entities, classes_future.result(), properties_future.result()
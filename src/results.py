@@ -0,0 +1,97 @@
+"""Formatting helpers shared by the CLI and the Streamlit chat.
+
+These turn SPARQL JSON results and the retrieved pipeline context into plain
+strings and small dicts that either front end can display.
+"""
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+try:
+    # Optional linear-time engine; the pattern below is re2-compatible.
+    import re2 as _regex
+except ImportError:
+    import re as _regex
+
+# The path class excludes "?" and "#", so it cannot overlap with the query
+# suffix and the pattern fails without backtracking on non-image URLs.
+IMAGE_URL_RE = _regex.compile(
+    r"(?im)^https?://[^\s?#]+\.(?:png|jpe?g|gif|webp)(?:[?#]\S*)?$"
+)
+
+_HTTP_PREFIXES = ("http://", "https://")
+_EMPTY_BINDING: Dict[str, str] = {}
+_FMT_LANG = "{} (@{})".format
+_FMT_TYPE = "{} ({})".format
+
+
+@lru_cache(maxsize=4096)
+def _short_datatype(datatype: str) -> str:
+    return datatype.rsplit("#", 1)[-1]
+
+
+def stringify_binding(binding: Dict[str, Any]) -> str:
+    """Render one SPARQL JSON binding, annotating language or datatype."""
+    value = binding.get("value", "")
+    # Membership tests skip lookups for absent keys; empty values count as absent.
+    lang = binding["xml:lang"] if "xml:lang" in binding else None
+    if not lang and "lang" in binding:
+        lang = binding["lang"]
+    if lang:
+        return _FMT_LANG(value, lang)
+    datatype = binding["datatype"] if "datatype" in binding else None
+    if datatype:
+        return _FMT_TYPE(value, _short_datatype(datatype))
+    return str(value)
+
+
+def compact_entities(entities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Reduce linked entities to the columns shown to the user."""
+    return [
+        {
+            "surface": ent.get("surface_form", ""),
+            "uri": ent.get("uri", ""),
+            "types": ent.get("types", ""),
+        }
+        for ent in entities
+    ]
+
+
+def compact_schema(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Reduce retrieved classes/properties to the columns shown to the user."""
+    return [
+        {"label": item["label"], "prefixed": item["prefixed"], "uri": item["uri"]}
+        for item in items
+    ]
+
+
+def parse_results(
+    results: Dict[str, Any]
+) -> Tuple[Dict[str, List[str]], List[str], List[str]]:
+    """Return column-oriented results, the column names, and image URLs."""
+    if "boolean" in results:
+        value = "true" if results.get("boolean") else "false"
+        return {"ASK": [value]}, ["ASK"], []
+
+    head = results.get("head", {})
+    vars_ = head.get("vars", [])
+    bindings = results.get("results", {}).get("bindings", [])
+    columns: Dict[str, List[str]] = {var: [] for var in vars_}
+    candidates: List[str] = []
+
+    for row in bindings:
+        for var in vars_:
+            binding = row.get(var, _EMPTY_BINDING)
+            value = binding.get("value", "")
+            if isinstance(value, str):
+                # Cheap prefix test keeps literals and numbers out of the regex scan.
+                value = value.strip()
+                if value.startswith(_HTTP_PREFIXES) and "\n" not in value:
+                    candidates.append(value)
+            columns[var].append(stringify_binding(binding))
+
+    # One scan over all values; each candidate sits on its own line.
+    # Deduplicate while keeping the order the endpoint returned them in.
+    image_urls = list(dict.fromkeys(IMAGE_URL_RE.findall("\n".join(candidates))))
+    return columns, vars_, image_urls
@@ -5,27 +5,42 @@ before SPARQL generation to reduce hallucinations and improve accuracy.
 """
 from __future__ import annotations
 
-from typing import Dict, List, Optional
+import json
+import threading
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np
-from SPARQLWrapper import JSON, SPARQLWrapper
 from sentence_transformers import SentenceTransformer
 
-from src.config import Config
+from src.config import Config, load_embedding_settings
+from src.executor import execute_query
 
+QUESTION_EMBEDDING_CACHE_SIZE = 256
+ENTITY_FETCH_MAX_WORKERS = 4
+STATIC_EMBEDDINGS_DIR = Path(__file__).resolve().parent.parent / "data"
+_STATIC_EMBEDDINGS_MANIFEST = "static_embeddings.json"
 
+
+_PREFIX_PAIRS = (
+    ("http://dbpedia.org/resource/", "dbr:"),
+    ("http://dbpedia.org/ontology/", "dbo:"),
+    ("http://dbpedia.org/property/", "dbp:"),
+    ("http://www.w3.org/2000/01/rdf-schema#", "rdfs:"),
+    ("http://www.w3.org/1999/02/22-rdf-syntax-ns#", "rdf:"),
+    ("http://xmlns.com/foaf/0.1/", "foaf:"),
+    ("http://www.w3.org/2001/XMLSchema#", "xsd:"),
+)
+
+
+@lru_cache(maxsize=8192)
 def uri_to_prefixed(uri: str) -> str:
     """Convert common DBpedia/RDF URIs to compact prefixed names."""
-    prefixes = {
-        "http://dbpedia.org/resource/": "dbr:",
-        "http://dbpedia.org/ontology/": "dbo:",
-        "http://dbpedia.org/property/": "dbp:",
-        "http://www.w3.org/2000/01/rdf-schema#": "rdfs:",
-        "http://www.w3.org/1999/02/22-rdf-syntax-ns#": "rdf:",
-        "http://xmlns.com/foaf/0.1/": "foaf:",
-        "http://www.w3.org/2001/XMLSchema#": "xsd:",
-    }
-    for base, prefix in prefixes.items():
+    for base, prefix in _PREFIX_PAIRS:
         if uri.startswith(base):
             return prefix + uri[len(base) :]
     return uri
@@ -194,81 +209,294 @@ COMMON_CLASSES: List[Dict[str, str]] = [
 ]
 
 
+_STATIC_TABLES: Dict[str, List[Dict[str, str]]] = {
+    "common_properties": COMMON_PROPERTIES,
+    "common_classes": COMMON_CLASSES,
+}
+
+
+def _item_rows(items: List[Dict[str, str]]) -> Tuple[List[Dict[str, str]], List[str]]:
+    """Split schema items into metadata rows and the texts to embed."""
+    meta: List[Dict[str, str]] = []
+    texts = []
+    for item in items:
+        label = item.get("label", "")
+        description = item.get("description", "")
+        uri = item.get("uri", "")
+        text = " ".join(part for part in [label, description] if part).strip()
+        texts.append(text or label or uri)
+        meta.append(
+            {
+                "label": label,
+                "uri": uri,
+                "description": description,
+                "prefixed": item.get("prefixed") or uri_to_prefixed(uri),
+                "text": text,
+            }
+        )
+    return meta, texts
+
+
+def _encode(model: SentenceTransformer, texts: List[str]) -> np.ndarray:
+    """Return an ``(len(texts), d)`` float32 matrix of L2-normalized rows."""
+    embeddings = model.encode(
+        texts, batch_size=64, convert_to_numpy=True, normalize_embeddings=True
+    )
+    return embeddings.astype(np.float32, copy=False)
+
+
+def _load_static_embeddings(
+    name: str,
+    model_name: str,
+    backend: str,
+    texts: List[str],
+    directory: Path = STATIC_EMBEDDINGS_DIR,
+) -> Optional[np.ndarray]:
+    """Memory-map precomputed embeddings if they match the model and texts."""
+    try:
+        manifest = json.loads((directory / _STATIC_EMBEDDINGS_MANIFEST).read_text("utf-8"))
+        if not isinstance(manifest, dict) or not isinstance(manifest.get("texts"), dict):
+            return None
+        if (
+            manifest.get("model") != model_name
+            or manifest.get("backend") != backend
+            or manifest["texts"].get(name) != texts
+        ):
+            return None
+        embeddings = np.load(directory / f"{name}.npy", mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    if embeddings.ndim != 2 or embeddings.shape[0] != len(texts):
+        return None
+    return embeddings
+
+
+def export_static_embeddings(
+    model_name: str, backend: str = "torch", directory: Path = STATIC_EMBEDDINGS_DIR
+) -> None:
+    """Encode the static tables and write them for memory-mapped loading."""
+    model = SentenceTransformer(model_name, backend=backend)
+    directory.mkdir(parents=True, exist_ok=True)
+    texts: Dict[str, List[str]] = {}
+    for name, items in _STATIC_TABLES.items():
+        texts[name] = _item_rows(items)[1]
+        np.save(directory / f"{name}.npy", np.ascontiguousarray(_encode(model, texts[name])))
+    manifest = {"model": model_name, "backend": backend, "texts": texts}
+    (directory / _STATIC_EMBEDDINGS_MANIFEST).write_text(
+        json.dumps(manifest, indent=2) + "\n", "utf-8"
+    )
+
+
+@dataclass(frozen=True)
+class ItemTable:
+    """Schema items stored as metadata rows plus one embedding matrix.
+
+    Row ``i`` of ``emb`` is the L2-normalized embedding of ``meta[i]``. Cached
+    entity tables hold float16 to halve their memory; ``concat`` with the
+    float32 static tables upcasts them for scoring.
+    """
+
+    meta: List[Dict[str, str]]
+    emb: np.ndarray
+
+    @classmethod
+    def empty(cls) -> ItemTable:
+        return cls([], np.empty((0, 0), dtype=np.float32))
+
+    @classmethod
+    def concat(cls, tables: List[ItemTable]) -> ItemTable:
+        tables = [table for table in tables if table.meta]
+        if not tables:
+            return cls.empty()
+        if len(tables) == 1:
+            return tables[0]
+        meta = [item for table in tables for item in table.meta]
+        return cls(meta, np.vstack([table.emb for table in tables]))
+
+    def unique_by_uri(self) -> ItemTable:
+        """Drop repeated URIs, keeping the first occurrence of each."""
+        first: Dict[str, int] = {}
+        for idx, item in enumerate(self.meta):
+            first.setdefault(item["uri"], idx)
+        if len(first) == len(self.meta):
+            return self
+        indices = list(first.values())
+        return ItemTable([self.meta[idx] for idx in indices], self.emb[indices])
+
+
 class SchemaStore:
     """Schema retriever backed by embeddings and light DBpedia lookups."""
 
     def __init__(self, config: Config) -> None:
         self.config = config
-        self.model = SentenceTransformer(config.embedding_model)
-        self._entity_property_cache: Dict[str, List[Dict[str, object]]] = {}
-        self._static_properties = self._prepare_items(COMMON_PROPERTIES)
-        self._static_classes = self._prepare_items(COMMON_CLASSES)
-
-    def _prepare_items(self, items: List[Dict[str, str]]) -> List[Dict[str, object]]:
-        prepared: List[Dict[str, object]] = []
-        texts = []
-        for item in items:
-            label = item.get("label", "")
-            description = item.get("description", "")
-            text = " ".join(part for part in [label, description] if part).strip()
-            texts.append(text or label or item.get("uri", ""))
-        embeddings = self._embed_texts(texts)
-        for item, text, emb in zip(items, texts, embeddings):
-            prepared.append(
-                {
-                    "label": item.get("label", ""),
-                    "uri": item.get("uri", ""),
-                    "description": item.get("description", ""),
-                    "prefixed": uri_to_prefixed(item.get("uri", "")),
-                    "text": text,
-                    "embedding": emb,
-                }
-            )
-        return prepared
+        self._model: Optional[SentenceTransformer] = None
+        self._model_lock = threading.Lock()
+        self._entity_property_cache: Dict[str, ItemTable] = {}
+        self._entity_property_lock = threading.Lock()
+        self._question_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._question_cache_lock = threading.Lock()
+        self._static_properties = self._load_static_table("common_properties")
+        self._static_classes = self._load_static_table("common_classes")
 
-    def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+    @property
+    def model(self) -> SentenceTransformer:
+        """The embedding model, loaded on first use."""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    # "onnx" / "openvino" run the same encode() API on an optimized CPU runtime.
+                    self._model = SentenceTransformer(
+                        self.config.embedding_model, backend=self.config.embedding_backend
+                    )
+        return self._model
+
+    def _load_static_table(self, name: str) -> ItemTable:
+        """Use the precomputed embeddings for a static table, else encode it."""
+        items = _STATIC_TABLES[name]
+        meta, texts = _item_rows(items)
+        embeddings = _load_static_embeddings(
+            name, self.config.embedding_model, self.config.embedding_backend, texts
+        )
+        if embeddings is None:
+            return self._prepare_items(items)
+        return ItemTable(meta, embeddings)
+
+    def _prepare_items(self, items: List[Dict[str, str]]) -> ItemTable:
+        meta, texts = _item_rows(items)
+        if not meta:
+            return ItemTable.empty()
+        return ItemTable(meta, self._embed_texts(texts))
+
+    def _embed_texts(self, texts: List[str]) -> np.ndarray:
+        """Return an ``(len(texts), d)`` float32 matrix of L2-normalized rows."""
         if not texts:
-            return []
-        embeddings = self.model.encode(texts).tolist()
-        normalized: List[List[float]] = []
-        for emb in embeddings:
-            vec = np.array(emb, dtype=float)
-            norm = np.linalg.norm(vec)
-            if norm == 0:
-                normalized.append(vec.tolist())
-            else:
-                normalized.append((vec / norm).tolist())
-        return normalized
-
-    def _fetch_properties_for_entity(self, entity_uri: str) -> List[Dict[str, object]]:
-        if entity_uri in self._entity_property_cache:
-            return self._entity_property_cache[entity_uri]
+            return np.empty((0, 0), dtype=np.float32)
+        return _encode(self.model, texts)
 
+    def _embed_question(self, question: str) -> np.ndarray:
+        """Embed the question, reusing recent results (LRU, thread-safe)."""
+        with self._question_cache_lock:
+            cached = self._question_cache.get(question)
+            if cached is not None:
+                self._question_cache.move_to_end(question)
+                return cached
+        embedding = self._embed_texts([question])[0]
+        with self._question_cache_lock:
+            self._question_cache[question] = embedding
+            if len(self._question_cache) > QUESTION_EMBEDDING_CACHE_SIZE:
+                self._question_cache.popitem(last=False)
+        return embedding
+
+    def _query_property_rows(
+        self, entity_uris: List[str]
+    ) -> Dict[str, List[Dict[str, object]]]:
+        """Fetch property bindings for the entities, grouped by entity URI.
+
+        Each entity gets its own LIMITed subselect, joined by UNION, so one
+        entity with many properties cannot crowd out the others.
+        Raises RuntimeError if the SPARQL request fails.
+        """
+        limit = self.config.schema_entity_property_limit
+        subqueries = "\n  UNION\n".join(
+            "  { SELECT DISTINCT ?s ?p ?label ?comment WHERE {\n"
+            f"    VALUES ?s {{ <{uri}> }}\n"
+            "    ?s ?p ?o .\n"
+            "    FILTER(\n"
+            "      STRSTARTS(STR(?p), \"http://dbpedia.org/ontology/\") ||\n"
+            "      STRSTARTS(STR(?p), \"http://dbpedia.org/property/\")\n"
+            "    )\n"
+            "    OPTIONAL { ?p rdfs:label ?label FILTER(lang(?label) = \"en\") }\n"
+            "    OPTIONAL { ?p rdfs:comment ?comment FILTER(lang(?comment) = \"en\") }\n"
+            f"  }} LIMIT {limit} }}"
+            for uri in entity_uris
+        )
         query = (
             "PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>\n"
-            "SELECT DISTINCT ?p ?label ?comment WHERE {\n"
-            f"  <{entity_uri}> ?p ?o .\n"
-            "  FILTER(\n"
-            "    STRSTARTS(STR(?p), \"http://dbpedia.org/ontology/\") ||\n"
-            "    STRSTARTS(STR(?p), \"http://dbpedia.org/property/\")\n"
-            "  )\n"
-            "  OPTIONAL { ?p rdfs:label ?label FILTER(lang(?label) = \"en\") }\n"
-            "  OPTIONAL { ?p rdfs:comment ?comment FILTER(lang(?comment) = \"en\") }\n"
-            "}\n"
-            f"LIMIT {self.config.schema_entity_property_limit}"
+            "SELECT ?s ?p ?label ?comment WHERE {\n"
+            f"{subqueries}\n"
+            "}"
         )
+        results = execute_query(query, self.config)
+
+        rows_by_entity: Dict[str, List[Dict[str, object]]] = defaultdict(list)
+        for row in results.get("results", {}).get("bindings", []):
+            rows = rows_by_entity[row.get("s", {}).get("value", "")]
+            # Cap client-side too, so a cache entry never depends on its batch.
+            if len(rows) < limit:
+                rows.append(row)
+        return rows_by_entity
+
+    def _query_property_rows_per_entity(
+        self, entity_uris: List[str]
+    ) -> Tuple[Dict[str, List[Dict[str, object]]], List[str]]:
+        """Fallback: one query per entity, issued concurrently.
+
+        Returns the grouped rows and the entities whose query succeeded.
+        """
+
+        def fetch(uri: str) -> Optional[Dict[str, List[Dict[str, object]]]]:
+            try:
+                return self._query_property_rows([uri])
+            except RuntimeError:
+                return None
+
+        rows_by_entity: Dict[str, List[Dict[str, object]]] = {}
+        fetched: List[str] = []
+        workers = min(ENTITY_FETCH_MAX_WORKERS, len(entity_uris))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for uri, rows in zip(entity_uris, pool.map(fetch, entity_uris)):
+                if rows is not None:
+                    rows_by_entity.update(rows)
+                    fetched.append(uri)
+        return rows_by_entity, fetched
 
-        sparql = SPARQLWrapper(self.config.dbpedia_sparql_endpoint)
-        sparql.setQuery(query)
-        sparql.setReturnFormat(JSON)
-        sparql.setTimeout(self.config.request_timeout_sec)
+    def _fetch_properties_for_entities(self, entity_uris: List[str]) -> None:
+        """Populate the property cache for all uncached entities.
+
+        One UNION query covers every entity; if the endpoint rejects it, each
+        entity is queried separately in parallel. Failed entities stay uncached.
+        """
+        missing = [
+            uri for uri in dict.fromkeys(entity_uris) if uri not in self._entity_property_cache
+        ]
+        if not missing:
+            return
 
         try:
-            results = sparql.query().convert()
-        except Exception:
-            return []
+            rows_by_entity = self._query_property_rows(missing)
+            fetched = missing
+        except RuntimeError:
+            if len(missing) == 1:
+                return
+            rows_by_entity, fetched = self._query_property_rows_per_entity(missing)
+
+        candidates_by_entity = [
+            self._dedupe_items(self._candidates_from_bindings(rows_by_entity.get(uri, [])))
+            for uri in fetched
+        ]
+        # Embed every new candidate in one batch, then slice per entity.
+        table = self._prepare_items(
+            [item for candidates in candidates_by_entity for item in candidates]
+        )
+        start = 0
+        with self._entity_property_lock:
+            for uri, candidates in zip(fetched, candidates_by_entity):
+                stop = start + len(candidates)
+                # Entities without rows are cached as empty so they are not re-fetched.
+                self._entity_property_cache[uri] = (
+                    ItemTable(table.meta[start:stop], table.emb[start:stop].astype(np.float16))
+                    if candidates
+                    else ItemTable.empty()
+                )
+                start = stop
 
-        bindings = results.get("results", {}).get("bindings", [])
+    def has_entity_properties(self, entity_uris: List[str]) -> bool:
+        """Return True if properties for every entity were fetched and cached."""
+        return all(uri in self._entity_property_cache for uri in entity_uris)
+
+    def _candidates_from_bindings(
+        self, bindings: List[Dict[str, object]]
+    ) -> List[Dict[str, object]]:
         candidates: List[Dict[str, object]] = []
         for row in bindings:
             uri = row.get("p", {}).get("value", "")
@@ -284,20 +512,6 @@ class SchemaStore:
                     "prefixed": uri_to_prefixed(uri),
                 }
             )
-
-        candidates = self._dedupe_items(candidates)
-        texts = []
-        for item in candidates:
-            text = " ".join(
-                part for part in [item.get("label", ""), item.get("description", "")] if part
-            ).strip()
-            texts.append(text or item.get("label", "") or item.get("uri", ""))
-            item["text"] = text
-        embeddings = self._embed_texts(texts)
-        for item, emb in zip(candidates, embeddings):
-            item["embedding"] = emb
-
-        self._entity_property_cache[entity_uri] = candidates
         return candidates
 
     def _dedupe_items(self, items: List[Dict[str, object]]) -> List[Dict[str, object]]:
@@ -310,43 +524,45 @@ class SchemaStore:
             if not existing:
                 by_uri[uri] = dict(item)
                 continue
-            for key in ("label", "description", "prefixed", "text", "embedding"):
+            for key in ("label", "description", "prefixed"):
                 if not existing.get(key) and item.get(key):
                     existing[key] = item.get(key)
         return list(by_uri.values())
 
-    def _rank_items(
-        self, question: str, items: List[Dict[str, object]], top_k: int
-    ) -> List[Dict[str, str]]:
-        if not items:
+    def _rank_items(self, question: str, table: ItemTable, top_k: int) -> List[Dict[str, str]]:
+        if not table.meta:
             return []
-        question_embedding = self._embed_texts([question])[0]
-        scored: List[Dict[str, object]] = []
-        for item in items:
-            embedding = item.get("embedding")
-            if not embedding:
-                text = item.get("text") or item.get("label") or item.get("uri")
-                embedding = self._embed_texts([str(text)])[0]
-            score = float(np.dot(np.array(question_embedding), np.array(embedding)))
-            scored.append({**item, "score": score})
-
-        scored.sort(key=lambda it: it.get("score", 0.0), reverse=True)
-        min_sim = self.config.schema_min_similarity
-        filtered = [item for item in scored if item.get("score", 0.0) >= min_sim]
-        if not filtered:
-            filtered = scored
-
-        trimmed: List[Dict[str, str]] = []
-        for item in filtered[:top_k]:
-            trimmed.append(
-                {
-                    "label": str(item.get("label", "")),
-                    "uri": str(item.get("uri", "")),
-                    "description": str(item.get("description", "")),
-                    "prefixed": str(item.get("prefixed", uri_to_prefixed(str(item.get("uri", ""))))),
-                }
-            )
-        return trimmed
+        question_embedding = self._embed_question(question)
+        # One matrix-vector product scores every candidate at once.
+        scores = table.emb @ question_embedding
+        k = min(top_k, len(scores))
+        if k <= 0:
+            return []
+        # Partial selection of the top k, then sort only those. argpartition
+        # picks arbitrarily among scores tied with the k-th, so take those
+        # ties in candidate order; the stable sort keeps that order too.
+        if k < len(scores):
+            kth = scores[np.argpartition(-scores, k - 1)[k - 1]]
+            above = np.flatnonzero(scores > kth)
+            ties = np.flatnonzero(scores == kth)[: k - len(above)]
+            top = np.concatenate([above, ties])
+        else:
+            top = np.arange(k)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        filtered = top[scores[top] >= self.config.schema_min_similarity]
+        if not filtered.size:
+            filtered = top
+
+        meta = table.meta
+        return [
+            {
+                "label": meta[idx]["label"],
+                "uri": meta[idx]["uri"],
+                "description": meta[idx]["description"],
+                "prefixed": meta[idx]["prefixed"],
+            }
+            for idx in filtered
+        ]
 
     def retrieve(
         self,
@@ -354,18 +570,34 @@ class SchemaStore:
         entities: Optional[List[Dict[str, str]]] = None,
         top_k: Optional[int] = None,
     ) -> List[Dict[str, str]]:
-        """Return the top-K properties that best match the question."""
+        """Return the top-K properties that best match the question.
+
+        Every item has ``label``, ``uri``, ``description`` and ``prefixed`` set.
+        """
         k = top_k or self.config.schema_top_k
-        candidates: List[Dict[str, object]] = list(self._static_properties)
-        for ent in entities or []:
-            uri = ent.get("uri", "")
-            if not uri:
-                continue
-            candidates.extend(self._fetch_properties_for_entity(uri))
-        candidates = self._dedupe_items(candidates)
+        entity_uris = [ent.get("uri", "") for ent in entities or [] if ent.get("uri")]
+        self._fetch_properties_for_entities(entity_uris)
+        tables = [self._static_properties]
+        tables.extend(
+            self._entity_property_cache[uri]
+            for uri in entity_uris
+            if uri in self._entity_property_cache
+        )
+        candidates = ItemTable.concat(tables).unique_by_uri()
         return self._rank_items(question, candidates, k)
 
     def retrieve_classes(self, question: str, top_k: Optional[int] = None) -> List[Dict[str, str]]:
         """Return a small list of likely classes for the question."""
         class_k = top_k or max(3, min(5, self.config.schema_top_k))
-        return self._rank_items(question, list(self._static_classes), class_k)
+        return self._rank_items(question, self._static_classes, class_k)
+
+
+@lru_cache(maxsize=1)
+def get_schema_store(config: Config) -> SchemaStore:
+    """Return the process-wide SchemaStore so the embedding model loads once."""
+    return SchemaStore(config)
+
+
+if __name__ == "__main__":
+    # Offline step: python -m src.schema_store (needs no GROQ_API_KEY).
+    export_static_embeddings(*load_embedding_settings())